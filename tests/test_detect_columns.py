@@ -0,0 +1,25 @@
+import importlib.util
+import os
+
+import pandas as pd
+
+# 脚本文件名为中文，无法直接 import，按路径加载
+_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '乐达.py')
+_spec = importlib.util.spec_from_file_location('leda', _SCRIPT)
+leda = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(leda)
+
+
+def test_id_column_before_phone_with_invalid_ids():
+    # 身份证列在手机列之前，且有2个身份证月份无效（命中率 < 0.95）；
+    # 身份证号中含类似手机号的数字串，不能因此占掉手机类别
+    ids = [f'11010119{80 + i % 10}0{1 + i % 9}151234' for i in range(20)]
+    ids[3] = '110101198013151234'
+    ids[7] = '110101198000151234'
+    df = pd.DataFrame({
+        '姓名': ['张三', '李四', '王五', '赵六'] * 5,
+        '身份证号': ids,
+        '手机': [f'138{i:08d}' for i in range(20)],
+    })
+
+    assert leda.detect_columns(df) == ('姓名', '手机', '身份证号')
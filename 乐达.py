@@ -1,9 +1,13 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import os
 import sys
 import re
-from openpyxl.styles import Alignment, PatternFill, Border, Side
+import multiprocessing as mp
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, PatternFill, Border, Side, Font
 
 # ================== 配置 ==================
 INPUT_DIR = "乐达-表格原文件"          # 存放原始Excel的文件夹
@@ -18,21 +22,43 @@ PHONE_COL = "手机"                  # 存放手机号的列名
 ID_COL = "证件号"                    # 存放身份证号的列名
 # =========================================
 
+# 模式字符串供向量化的 Series.str 方法使用；使用非捕获分组，便于 str.extract 直接取出完整匹配
+# 预编译的正则仅供单值辅助函数 clean_phone / clean_id 使用
+_PHONE_PATTERN = r'1[3-9]\d{9}'
+_ID_PATTERN = r'[1-9]\d{5}(?:19|20)\d{2}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])\d{3}[\dX]'
+_NAME_PATTERN = r'[\u4e00-\u9fa5]{2,4}'
+_PHONE_RE = re.compile(_PHONE_PATTERN)
+_ID_RE_CI = re.compile(_ID_PATTERN, re.IGNORECASE)
+
+# 输出表格样式（模块级只创建一次，各行复用）
+_THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+_CENTER_ALIGNMENT = Alignment(horizontal='center', vertical='center')
+_HEADER_FONT = Font(bold=True)
+_GREEN_FILL = PatternFill(start_color='92D050', end_color='92D050', fill_type='solid')
+_BLUE_FILL = PatternFill(start_color='00B0F0', end_color='00B0F0', fill_type='solid')
+_YELLOW_FILL = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
+_TEXT_COLUMNS = (1, 2)  # 手机和身份证号列（B列和C列）
+
 def clean_phone(phone_str):
     """从字符串中提取11位手机号（以1开头）"""
     if not phone_str or pd.isna(phone_str):
         return ''
     s = str(phone_str).strip()
-    match = re.search(r'1[3-9]\d{9}', s)
+    match = _PHONE_RE.search(s)
     return match.group() if match else ''
 
 def clean_id(id_str):
     """提取18位身份证号（最后一位可能是数字或X）"""
     if not id_str or pd.isna(id_str):
         return ''
-    s = str(id_str).strip().upper()
-    match = re.search(r'[1-9]\d{5}(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[\dX]', s)
-    return match.group() if match else ''
+    s = str(id_str).strip()
+    match = _ID_RE_CI.search(s)
+    return match.group().upper() if match else ''
 
 def calculate_age(id_card):
     """根据18位身份证号计算周岁年龄"""
@@ -49,7 +75,7 @@ def calculate_age(id_card):
 
 def age_category(age):
     """按年龄分类（新规则）"""
-    if age is None:
+    if age is None or pd.isna(age):
         return '未知'
     if age < 7:
         return '0-7岁'
@@ -67,31 +93,40 @@ def detect_columns(df):
     """
     # 对每一列进行评分
     scores = {col: {'name': 0, 'phone': 0, 'id': 0} for col in df.columns}
+    # 已有明显胜出列（命中率 >= 0.95）的类别，后续列不再为其评分
+    claimed = {'id': None, 'phone': None, 'name': None}
 
     for col in df.columns:
+        # 三类都已确定，无需再看剩下的列
+        if all(c is not None for c in claimed.values()):
+            break
+
         # 取该列所有非空值的前100行作为样本（避免全表扫描太慢）
         sample = df[col].dropna().astype(str).head(100)
         if sample.empty:
             continue
 
-        for value in sample:
-            # 手机号评分：包含11位手机号
-            if re.search(r'1[3-9]\d{9}', value):
-                scores[col]['phone'] += 1
-            # 身份证号评分：包含18位身份证号
-            if re.search(r'[1-9]\d{5}(19|20)\d{2}(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])\d{3}[\dXx]', value):
-                scores[col]['id'] += 1
-            # 姓名评分：纯2-4个汉字（不考虑其他字符）
-            if re.fullmatch(r'[\u4e00-\u9fa5]{2,4}', value):
-                scores[col]['name'] += 1
-
-    # 归一化评分（除以样本数，得到比例）
-    for col in df.columns:
-        total = len(df[col].dropna().head(100))
-        if total > 0:
-            scores[col]['name'] /= total
-            scores[col]['phone'] /= total
-            scores[col]['id'] /= total
+        # 向量化评分（传入模式字符串，pyarrow 字符串列也能走原生正则）
+        # 手机号评分：包含11位手机号
+        if claimed['phone'] is None:
+            scores[col]['phone'] = int(sample.str.contains(_PHONE_PATTERN).sum())
+        # 身份证号评分：包含18位身份证号（末位X不区分大小写）
+        if claimed['id'] is None:
+            scores[col]['id'] = int(sample.str.contains(_ID_PATTERN, case=False).sum())
+        # 姓名评分：纯2-4个汉字（不考虑其他字符）
+        if claimed['name'] is None:
+            scores[col]['name'] = int(sample.str.fullmatch(_NAME_PATTERN).sum())
+
+        # 归一化评分（除以样本数，得到比例）
+        total = len(sample)
+        scores[col] = {k: v / total for k, v in scores[col].items()}
+
+        # 只有不会与其他类别冲突的列（其余类别得分都 <= 0.3）才能认领，
+        # 否则如身份证列常含类似手机号的数字串，会占掉手机类别，导致真正的手机列不被评分
+        for role in claimed:
+            others_low = all(v <= 0.3 for k, v in scores[col].items() if k != role)
+            if claimed[role] is None and scores[col][role] >= 0.95 and others_low:
+                claimed[role] = col
 
     # 找出每个类别得分最高的列（要求得分 > 0.3，避免误判）
     name_col = max(scores, key=lambda c: scores[c]['name']) if max(s['name'] for s in scores.values()) > 0.3 else None
@@ -139,9 +174,32 @@ def detect_columns(df):
     print(f"自动识别结果：姓名列 = '{name_col}'，手机列 = '{phone_col}'，身份证列 = '{id_col}'")
     return name_col, phone_col, id_col
 
+def _to_text(series):
+    """将手机号列转为可空字符串；含空值的整数列会被读成浮点数，先转 Int64 以免出现 '13800138000.0'"""
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    return series.astype('string').fillna('')
+
+def _styled_row(worksheet, values, fill=None, header=False):
+    """为只写工作表生成一行已设置好样式的单元格（居中、细边框；表头加粗，数据行的手机、身份证号列为文本格式）"""
+    cells = []
+    for col_idx, value in enumerate(values):
+        cell = WriteOnlyCell(worksheet, value=None if pd.isna(value) else value)
+        cell.alignment = _CENTER_ALIGNMENT
+        cell.border = _THIN_BORDER
+        if header:
+            cell.font = _HEADER_FONT
+        elif col_idx in _TEXT_COLUMNS:
+            cell.number_format = '@'
+        if fill:
+            cell.fill = fill
+        cells.append(cell)
+    return cells
+
 def process_excel(input_path, output_path):
     print(f"正在处理: {input_path}")
-    df = pd.read_excel(input_path)
+    # calamine（Rust 实现）解析 xlsx 比默认的 openpyxl 快得多
+    df = pd.read_excel(input_path, engine='calamine')
 
     # 确定列名
     if AUTO_DETECT:
@@ -160,20 +218,31 @@ def process_excel(input_path, output_path):
             raise ValueError(f"手动指定的列不存在：{missing}。请修改脚本开头的列名变量或启用自动识别。")
 
     # 提取并清理数据
-    names = df[name_col].astype(str).replace('nan', '').str.strip()
-    raw_phones = df[phone_col].astype(str).replace('nan', '')
-    raw_ids = df[id_col].astype(str).replace('nan', '')
+    # 可空字符串类型原生保留缺失值，无需先转成 'nan' 再替换
+    names = df[name_col].astype('string').fillna('').str.strip()
+    raw_phones = _to_text(df[phone_col])
+    # 身份证号不走 Int64：读成浮点数的18位号码已丢失精度，转回整数会得到看似有效的错误号码
+    raw_ids = df[id_col].astype('string').fillna('')
+
+    # 向量化提取（clean_phone / clean_id 仅保留供单值调用，不在此处使用）
+    phones = raw_phones.str.extract(f'({_PHONE_PATTERN})', expand=False).fillna('')
+    id_cards = raw_ids.str.upper().str.extract(f'({_ID_PATTERN})', expand=False).fillna('')
+
+    # 计算年龄（向量化：一次性解析出生日期，无效日期为 NaT，对应年龄为空）
+    births = pd.to_datetime(id_cards.str[6:14], format='%Y%m%d', errors='coerce')
+    today = pd.Timestamp.today()
+    not_yet_birthday = (births.dt.month > today.month) | ((births.dt.month == today.month) & (births.dt.day > today.day))
+    ages = (today.year - births.dt.year - not_yet_birthday.astype(int)).astype('Int64')
+
+    # 分类（与 age_category 规则一致，整数年龄按右闭区间分桶，空年龄为"未知"）
+    categories = pd.cut(
+        ages,
+        bins=[float('-inf'), 6, 22, 59, float('inf')],
+        labels=['0-7岁', '7-23岁', '23-60岁', '60岁及以上']
+    ).astype(object).fillna('未知')
 
-    phones = [clean_phone(p) for p in raw_phones]
-    id_cards = [clean_id(i) for i in raw_ids]
-
-    # 计算年龄和分类
-    ages = []
-    categories = []
-    for id_card in id_cards:
-        age = calculate_age(id_card)
-        ages.append(age)
-        categories.append(age_category(age))
+    # 定义年龄段顺序（与图片代码一致）
+    category_order = ['23-60岁', '7-23岁', '0-7岁', '60岁及以上', '未知']
 
     # 构建基础DataFrame
     base_df = pd.DataFrame({
@@ -181,18 +250,19 @@ def process_excel(input_path, output_path):
         '手机': phones,
         '身份证号': id_cards,
         '年龄': ages,
-        '年龄段': categories
+        '年龄段': pd.Categorical(categories, categories=category_order, ordered=True)
     })
 
-    # 构建输出DataFrame的各个部分
-    parts = []
+    # 按列收集输出数据，最后一次性构建DataFrame（避免大量单行DataFrame再concat）
+    output_columns = list(base_df.columns)
+    out = {col: [] for col in output_columns}
 
-    # 定义年龄段顺序（与图片代码一致）
-    category_order = ['23-60岁', '7-23岁', '0-7岁', '60岁及以上', '未知']
+    # 一次分组代替逐个年龄段的布尔筛选
+    groups = dict(tuple(base_df.groupby('年龄段', observed=True, sort=False)))
 
     for i, cat in enumerate(category_order):
-        cat_data = base_df[base_df['年龄段'] == cat].copy()
-        if cat_data.empty:
+        cat_data = groups.get(cat)
+        if cat_data is None or cat_data.empty:
             continue
 
         # 根据年龄段定义细分条件
@@ -205,110 +275,74 @@ def process_excel(input_path, output_path):
             sub_condition[cond] = True
 
         # 分离主数据和细分数据
-        main_data = cat_data[~sub_condition].copy()
-        sub_data = cat_data[sub_condition].copy()
+        main_data = cat_data[~sub_condition]
+        sub_data = cat_data[sub_condition]
 
-        if not main_data.empty:
-            parts.append(main_data)
-        if not sub_data.empty:
-            parts.append(sub_data)
+        for col in output_columns:
+            out[col].extend(main_data[col].tolist())
+            out[col].extend(sub_data[col].tolist())
 
         # 统计行
         total_count = len(cat_data)
-        stats_row = pd.DataFrame([{
-            '姓名': f'人数：{total_count}',
-            '手机': '',
-            '身份证号': '',
-            '年龄': '',
-            '年龄段': ''
-        }])
-        parts.append(stats_row)
+        out['姓名'].append(f'人数：{total_count}')
+        for col in output_columns[1:]:
+            out[col].append('')
 
         # 如果不是最后一个年龄段，添加空行
         if i < len(category_order) - 1:
-            empty_row = pd.DataFrame([{
-                '姓名': '',
-                '手机': '',
-                '身份证号': '',
-                '年龄': '',
-                '年龄段': ''
-            }])
-            parts.append(empty_row)
-
-    # 合并所有部分
-    final_df = pd.concat(parts, ignore_index=True)
+            for col in output_columns:
+                out[col].append('')
+
+    final_df = pd.DataFrame(out, columns=output_columns)
 
     # ---------- 写入Excel，设置格式 ----------
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-        final_df.to_excel(writer, index=False, sheet_name='Sheet1')
-        workbook = writer.book
-        worksheet = writer.sheets['Sheet1']
-
-        # 设置列宽
-        col_widths = {'A': 10, 'B': 15, 'C': 30, 'D': 10, 'E': 12}
-        for col, width in col_widths.items():
-            worksheet.column_dimensions[col].width = width
-
-        # 定义细边框样式
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-        # 设置所有单元格居中对齐和边框
-        alignment = Alignment(horizontal='center', vertical='center')
-        for row in worksheet.iter_rows(min_row=1, max_row=worksheet.max_row, min_col=1, max_col=5):
-            for cell in row:
-                cell.alignment = alignment
-                cell.border = thin_border
-
-        # 设置手机和身份证号列为文本格式
-        for col_idx in [2, 3]:  # B列和C列
-            for row in range(2, worksheet.max_row + 1):
-                cell = worksheet.cell(row, col_idx)
-                cell.number_format = '@'
-
-        # 定义背景色
-        green_fill = PatternFill(start_color='92D050', end_color='92D050', fill_type='solid')
-        blue_fill = PatternFill(start_color='00B0F0', end_color='00B0F0', fill_type='solid')
-        yellow_fill = PatternFill(start_color='FFFF00', end_color='FFFF00', fill_type='solid')
-
-        # 应用背景色
-        for row_idx in range(2, worksheet.max_row + 1):
-            name_cell = worksheet.cell(row_idx, 1)
-            age_cell = worksheet.cell(row_idx, 4)
-            cat_cell = worksheet.cell(row_idx, 5)
-
-            name = name_cell.value
-            age = age_cell.value
-            cat = cat_cell.value
-
-            if name and str(name).strip() and cat:
-                # 0-7岁和60岁及以上为黄色
-                if cat == '60岁及以上' or cat == '0-7岁':
-                    for col_idx in range(1, 6):
-                        worksheet.cell(row_idx, col_idx).fill = yellow_fill
-                elif cat == '23-60岁' and age is not None:
-                    try:
-                        age_val = float(age) if not isinstance(age, int) else age
-                        if 23 <= age_val < 25:
-                            for col_idx in range(1, 6):
-                                worksheet.cell(row_idx, col_idx).fill = green_fill
-                    except:
-                        pass
-                elif cat == '7-23岁' and age is not None:
-                    try:
-                        age_val = float(age) if not isinstance(age, int) else age
-                        if 21 <= age_val < 23:
-                            for col_idx in range(1, 6):
-                                worksheet.cell(row_idx, col_idx).fill = blue_fill
-                    except:
-                        pass
+    # openpyxl 只写模式：逐行流式写出，单元格创建时即带上样式，不在内存中保留整张表
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Sheet1')
+
+    # 设置列宽（只写模式下须在写入数据前设置）
+    col_widths = {'A': 10, 'B': 15, 'C': 30, 'D': 10, 'E': 12}
+    for col, width in col_widths.items():
+        worksheet.column_dimensions[col].width = width
+
+    # 向量化计算每行背景色（统计行、空行的年龄段为空，不会命中）
+    cats = final_df['年龄段']
+    row_ages = pd.to_numeric(final_df['年龄'], errors='coerce')
+    has_name = final_df['姓名'].astype(str).str.strip() != ''
+    # 0-7岁和60岁及以上为黄色
+    mask_yellow = has_name & cats.isin(['60岁及以上', '0-7岁'])
+    mask_green = has_name & (cats == '23-60岁') & (row_ages >= 23) & (row_ages < 25)
+    mask_blue = has_name & (cats == '7-23岁') & (row_ages >= 21) & (row_ages < 23)
+    fills = np.empty(len(final_df), dtype=object)
+    fills[mask_yellow.to_numpy()] = _YELLOW_FILL
+    fills[mask_green.to_numpy()] = _GREEN_FILL
+    fills[mask_blue.to_numpy()] = _BLUE_FILL
+
+    # 每行一次 append，单元格在创建时即带好样式
+    worksheet.append(_styled_row(worksheet, final_df.columns, header=True))
+    rows = final_df.itertuples(index=False, name=None)
+    for row, fill in zip(rows, fills):
+        worksheet.append(_styled_row(worksheet, row, fill))
+
+    workbook.save(output_path)
 
     print(f"已完成: {output_path}")
 
+def _process_file(filename):
+    """处理单个文件（在子进程中运行，各文件相互独立）"""
+    input_path = os.path.join(INPUT_DIR, filename)
+    output_path = os.path.join(OUTPUT_DIR, filename)
+
+    # 输出文件存在且不比输入旧时才跳过；输入修改过则重新处理
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+        print(f"跳过已处理文件: {filename}")
+        return
+
+    try:
+        process_excel(input_path, output_path)
+    except Exception as e:
+        print(f"处理文件 {filename} 时出错: {e}")
+
 def main():
     if not os.path.isdir(INPUT_DIR):
         print(f"错误：输入目录 '{INPUT_DIR}' 不存在，请检查路径。")
@@ -321,20 +355,12 @@ def main():
         print(f"输入目录 '{INPUT_DIR}' 中没有找到 Excel 文件（.xlsx）。")
         return
 
-    for filename in excel_files:
-        input_path = os.path.join(INPUT_DIR, filename)
-        output_path = os.path.join(OUTPUT_DIR, filename)
-
-        if os.path.exists(output_path):
-            print(f"跳过已处理文件: {filename}")
-            continue
-
-        try:
-            process_excel(input_path, output_path)
-        except Exception as e:
-            print(f"处理文件 {filename} 时出错: {e}")
+    # 多进程并行处理各文件
+    with mp.Pool(min(len(excel_files), os.cpu_count() or 1)) as pool:
+        pool.map(_process_file, excel_files)
 
     print("全部处理完毕！")
 
 if __name__ == "__main__":
+    mp.freeze_support()  # PyInstaller 打包后子进程需要
     main()
\ No newline at end of file